@@ -0,0 +1,117 @@
+"""
+Monte Carlo rollouts for the hard and extreme computer players, compiled with Numba.
+
+Everything here works on plain arrays (see pawn_win_rates), so the game loop
+runs without Python objects, bytecode dispatch or the GIL.
+"""
+import numpy as np
+from numba import njit
+
+# Rollouts nobody has won after this many turns count as lost
+MAX_ROLLOUT_TURNS = 1000
+
+@njit(cache=True)
+def _roll(cum_weights):
+    r = np.random.random() * cum_weights[5]
+    for face in range(5):
+        if r < cum_weights[face]:
+            return face + 1
+    return 6
+
+@njit(cache=True)
+def _roll_player(positions, jump, dice, finish_boost, player):
+    """Rolls like computer_turn: a fair die boosted on the winning face once every pawn is one die away."""
+    if finish_boost[player] > 1:
+        winning_tile = len(jump) - 1
+        dice_to_win = winning_tile - positions[player].min()
+        if dice_to_win <= 6:
+            r = np.random.random() * (5 + finish_boost[player])
+            if r < finish_boost[player]:
+                return dice_to_win
+            # The other five faces, equally likely
+            face = 1 + int(r - finish_boost[player])
+            return face if face < dice_to_win else face + 1
+    return _roll(dice[player])
+
+@njit(cache=True)
+def _move(positions, finished, jump, player, pawn, roll):
+    """Moves one pawn the way process_move_logic does, returns True if it won the game."""
+    winning_tile = len(jump) - 1
+    new_pos = positions[player, pawn] + roll
+    if new_pos > winning_tile:
+        return False
+    new_pos = jump[new_pos]
+    positions[player, pawn] = new_pos
+    if new_pos != winning_tile:
+        return False
+    finished[player, pawn] = True
+    for other in range(finished.shape[1]):
+        if not finished[player, other]:
+            return False
+    return True
+
+@njit(cache=True)
+def _rollout(positions, finished, jump, dice, finish_boost, player):
+    """Plays random pawns from here until someone wins, returns the winner or -1."""
+    candidates = np.empty(positions.shape[1], dtype=np.int64)
+    for _ in range(MAX_ROLLOUT_TURNS):
+        roll = _roll_player(positions, jump, dice, finish_boost, player)
+        count = 0
+        for pawn in range(positions.shape[1]):
+            if not finished[player, pawn]:
+                candidates[count] = pawn
+                count += 1
+        if _move(positions, finished, jump, player, candidates[np.random.randint(count)], roll):
+            return player
+        if roll != 6:
+            player = 1 - player
+    return -1
+
+@njit(cache=True, nogil=True)
+def pawn_win_rates(positions, finished, jump, dice, finish_boost, player, roll, rollouts):
+    """
+    For each of `player`'s pawns, the share of `rollouts` random playouts that
+    `player` wins after moving that pawn by `roll`. Finished pawns get -1.
+
+    positions: int64[players, pawns], finished: bool[players, pawns]
+    jump: int64[tile] -> tile after snakes/ladders, dice: float64[players, 6]
+    cumulative weights per player, finish_boost: int64[players] (see _roll_player).
+    """
+    rates = np.full(positions.shape[1], -1.0)
+    for pawn in range(positions.shape[1]):
+        if finished[player, pawn]:
+            continue
+        # Pawns on the same tile make the same move, play it out once
+        same_as = -1
+        for other in range(pawn):
+            if not finished[player, other] and positions[player, other] == positions[player, pawn]:
+                same_as = other
+                break
+        if same_as >= 0:
+            rates[pawn] = rates[same_as]
+            continue
+        wins = 0
+        for _ in range(rollouts):
+            sim_positions = positions.copy()
+            sim_finished = finished.copy()
+            if _move(sim_positions, sim_finished, jump, player, pawn, roll):
+                wins += 1
+                continue
+            next_player = player if roll == 6 else 1 - player
+            if _rollout(sim_positions, sim_finished, jump, dice, finish_boost, next_player) == player:
+                wins += 1
+        rates[pawn] = wins / rollouts
+    return rates
+
+def compile_kernels():
+    """Compiles the kernels (or loads them from Numba's cache) ahead of the first computer turn."""
+    pawn_win_rates(
+        np.zeros((2, 1), dtype=np.int64),
+        np.zeros((2, 1), dtype=np.bool_),
+        np.arange(7, dtype=np.int64),
+        np.ones((2, 6)).cumsum(axis=1),
+        np.ones(2, dtype=np.int64),
+        1,
+        1,
+        1,
+    )
@@ -1,18 +1,42 @@
 import sqlite3
-import json
+import asyncio
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import itertools
 import random
-import string
-import uuid
+import base64
+import secrets
 import os
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+import aiosqlite
+import msgspec
+import numpy as np
 from fastapi import FastAPI, HTTPException, Body, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from pydantic import BaseModel
 
-app = FastAPI()
+import sim
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_db()
+    await init_db()
+    # JIT compile the computer's rollouts now rather than on the first turn
+    await run_in_threadpool(sim.compile_kernels)
+    # One line per Gunicorn worker
+    print(f"Worker {os.getpid()} ready")
+    # Background housekeeping for the app's lifetime, see cleanup_loop
+    cleanup_task = asyncio.create_task(cleanup_loop())
+    yield
+    cleanup_task.cancel()
+    await close_db()
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -31,22 +55,183 @@ app.add_middleware(
 PAWNS_PER_PLAYER = 3
 WINNING_TILE = 100
 DB_FILE = "snakeladder.db"
+ROOM_ID_LENGTH = 6
+MAX_LOG_ENTRIES = 50 # Older log lines are dropped on save to keep the state blob bounded
+CLEANUP_INTERVAL_SECONDS = 600 # How often stale games are deleted
+MAX_CACHED_GAMES = 1024 # Least recently used games beyond this are only kept in SQLite
+
+# --- Dice ---
+DICE_FACES = [1, 2, 3, 4, 5, 6]
+FAIR_DICE_PROB = [0.1666, 0.1666, 0.1667, 0.1667, 0.1667, 0.1667]
+
+# Cumulative weights per computer preset, precomputed once for random.choices
+DICE_PRESETS = {
+    # Lower dice more likely (linear)
+    "easy": list(itertools.accumulate([0.2857, 0.2381, 0.1905, 0.1429, 0.0952, 0.0476])),
+    # Higher dice more likely (linear)
+    "hard": list(itertools.accumulate([0.0476, 0.0952, 0.1429, 0.1905, 0.2381, 0.2857])),
+    # Even unfair dice (quadratic)
+    "extreme": list(itertools.accumulate([0.0110, 0.0440, 0.0989, 0.1758, 0.2747, 0.3956])),
+}
+
+def _finish_cum_weights(face: int, boost: int) -> List[float]:
+    """Fair dice, but `boost` times the prob to roll `face`."""
+    probs = list(FAIR_DICE_PROB)
+    probs[face - 1] *= boost
+    return list(itertools.accumulate(probs))
+
+# Double (hard) or triple (extreme) prob to win when just one dice away
+FINISH_BOOST = {"hard": 2, "extreme": 3}
+DICE_PRESETS.update({
+    f"{difficulty}_finish_{face}": _finish_cum_weights(face, boost)
+    for difficulty, boost in FINISH_BOOST.items()
+    for face in DICE_FACES
+})
+
+# Rollout dice per computer difficulty: the human rolls fair, the computer
+# (player 2) with its own preset and finish boost
+ROLLOUT_DICE = {
+    difficulty: (
+        np.array([list(itertools.accumulate(FAIR_DICE_PROB)), DICE_PRESETS[difficulty]]),
+        np.array([1, boost], dtype=np.int64),
+    )
+    for difficulty, boost in FINISH_BOOST.items()
+}
+# Random playouts per candidate pawn, see sim.pawn_win_rates. Extreme differs
+# from hard only in its dice; more playouts didn't win measurably more games.
+ROLLOUTS_PER_PAWN = 200
+
+def roll_weighted(cum_weights: List[float]) -> int:
+    """Rolls one die from 6 cumulative weights, cheaper than random.choices for k=1."""
+    r = random.random() * cum_weights[5]
+    if r < cum_weights[0]:
+        return 1
+    if r < cum_weights[1]:
+        return 2
+    if r < cum_weights[2]:
+        return 3
+    if r < cum_weights[3]:
+        return 4
+    if r < cum_weights[4]:
+        return 5
+    return 6
 
 # --- Database Setup ---
-def init_db():
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS games (
-                room_id TEXT PRIMARY KEY,
-                state TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-init_db()
+# WITHOUT ROWID stores each row in the primary key B-tree itself, saving a
+# lookup per read and write. updated_at is unix seconds (unixepoch() needs
+# SQLite 3.38+).
+_CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS games (
+        room_id TEXT PRIMARY KEY,
+        status TEXT,
+        state BLOB NOT NULL,
+        updated_at INTEGER NOT NULL,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+"""
+# Kept as constants so every call hits sqlite3's per-connection statement cache
+# Optimistic concurrency between worker processes: a save only lands if the
+# row's version is still the one the game was loaded at, see save_game
+_SAVE_SQL = """
+    UPDATE games
+    SET status = ?, state = ?, updated_at = unixepoch(), version = version + 1
+    WHERE room_id = ? AND version = ?
+    RETURNING version
+"""
+# New rooms never overwrite an existing one, see create_game
+_INSERT_SQL = """
+    INSERT INTO games (room_id, status, state, updated_at)
+    VALUES (?, ?, ?, unixepoch())
+    ON CONFLICT(room_id) DO NOTHING
+    RETURNING version
+"""
+# Skips the state blob when the caller's cached copy is already at this version
+_LOAD_SQL = """
+    SELECT version, CASE WHEN version = ? THEN NULL ELSE state END
+    FROM games WHERE room_id = ?
+"""
+# Abandoned games expire after a day, finished ones after 10 minutes
+# (long enough for both players' last poll)
+_CLEANUP_SQL = """
+    DELETE FROM games
+    WHERE updated_at < unixepoch() - 600
+    AND (
+        updated_at < unixepoch() - 86400
+        OR status = 'finished'
+    )
+    RETURNING room_id
+"""
+
+# One aiosqlite connection for the whole process, opened by open_db() at startup.
+# aiosqlite runs every statement on the connection's own thread, in order.
+_conn: Optional[aiosqlite.Connection] = None
+
+# Write-through LRU cache of decoded games, so polling /state skips reading and
+# decoding the state. Entries remember the row version they were loaded or
+# saved at (game._version), so other workers' saves invalidate only their room.
+# Only touched from the event loop, so it needs no lock.
+_STATE_CACHE: "OrderedDict[str, GameState]" = OrderedDict()
+
+async def open_db():
+    global _conn
+    _conn = await aiosqlite.connect(DB_FILE, isolation_level=None)
+    # First, so other workers opening the database at the same time wait instead of failing
+    await _conn.execute("PRAGMA busy_timeout=5000")
+    await _conn.execute("PRAGMA journal_mode=WAL")
+    await _conn.execute("PRAGMA synchronous=NORMAL")
+    await _conn.execute("PRAGMA temp_store=MEMORY")
+    await _conn.execute("PRAGMA cache_size=-20000") # ~20 MB page cache
+    await _conn.execute("PRAGMA mmap_size=268435456") # read hot pages via mmap
+
+async def init_db():
+    # Gunicorn workers start together. Holding the write lock lets one of them
+    # create or migrate the table while the others wait and then find it done.
+    await _conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = await _conn.execute_fetchall(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'games'"
+        )
+        if rows and "WITHOUT ROWID" not in rows[0][0]:
+            await migrate_rowid_table()
+        else:
+            await _conn.execute(_CREATE_SQL)
+        # Databases created before the version column existed
+        columns = {row[1] for row in await _conn.execute_fetchall("PRAGMA table_info(games)")}
+        if "version" not in columns:
+            await _conn.execute("ALTER TABLE games ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        await _conn.execute("CREATE INDEX IF NOT EXISTS idx_games_updated ON games(updated_at)")
+    except BaseException:
+        await _conn.execute("ROLLBACK")
+        raise
+    await _conn.execute("COMMIT")
+
+async def migrate_rowid_table():
+    """
+    Copies a games table from before WITHOUT ROWID into the current schema.
+    Runs inside init_db's transaction.
+    """
+    columns = {row[1] for row in await _conn.execute_fetchall("PRAGMA table_info(games)")}
+    # The oldest databases have no status column
+    status = "status" if "status" in columns else "NULL"
+    await _conn.execute("ALTER TABLE games RENAME TO games_old")
+    await _conn.execute(_CREATE_SQL)
+    await _conn.execute(f"""
+        INSERT INTO games (room_id, status, state, updated_at)
+        SELECT
+            room_id,
+            {status},
+            CAST(state AS BLOB),
+            COALESCE(CAST(strftime('%s', updated_at) AS INTEGER), unixepoch())
+        FROM games_old
+    """)
+    await _conn.execute("DROP TABLE games_old")
+
+async def close_db():
+    await _conn.close()
 
 # --- Models ---
-class GameState(BaseModel):
+# dict=True allows derived, non-persisted attributes (see get_move_table)
+class GameState(msgspec.Struct, dict=True):
     room_id: str
     status: str  # 'waiting', 'playing', 'finished'
     players: List[str]
@@ -59,6 +244,10 @@ class GameState(BaseModel):
     winner: Optional[int] = None
     log: List[str] = []
 
+# GameState is persisted and served as msgspec-encoded JSON
+_ENCODER = msgspec.json.Encoder()
+_DECODER = msgspec.json.Decoder(GameState)
+
 class CreateGameResponse(BaseModel):
     room_id: str
     player_token: str
@@ -83,73 +272,183 @@ class ActionRequest(BaseModel):
 
 # --- Helpers ---
 def generate_room_id():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    # 30 random bits as 6 base32 characters (A-Z, 2-7)
+    return base64.b32encode(os.urandom(4)).decode()[:ROOM_ID_LENGTH]
+
+# Candidate ends for every start, in the original randint ranges. A start is
+# drawn uniformly and then one of its ends, so lengths keep the original spread,
+# but there is no unbounded rejection loop.
+LADDER_CANDIDATES = [(start, range(start + 10, 95)) for start in range(2, 81)]
+SNAKE_CANDIDATES = [(start, range(2, start - 9)) for start in range(15, 98)]
+FINAL_SNAKE_CANDIDATES = [(start, range(50, start - 9)) for start in range(98, 100)]
+
+def _random_items(pool, tries=16):
+    """
+    Yields random items: a few independent picks, like the original retry loop,
+    then the whole pool in random order so the caller always finds a free item.
+    """
+    for _ in range(tries):
+        yield random.choice(pool)
+    yield from random.sample(pool, len(pool))
+
+def _draw_pair(candidates, used_tiles: set) -> Tuple[int, int]:
+    """Picks a random free start, then a random free end for it, skipping used tiles."""
+    for start, ends in _random_items(candidates):
+        if start in used_tiles:
+            continue
+        for end in _random_items(ends):
+            if end not in used_tiles:
+                used_tiles.update((start, end))
+                return start, end
+    raise RuntimeError("No free snake or ladder tiles left")
 
 def generate_board():
     snakes = {}
     ladders = {}
+    used_tiles = set() # Every start and end placed so far, no tile is shared
     
     # Create Ladders
-    while len(ladders) < 5:
-        start = random.randint(2, 80)
-        end = random.randint(start + 10, 94)
-        if (
-            str(start) not in ladders
-            and end not in ladders.values()
-            and start not in ladders.values()
-            and str(end) not in ladders
-        ):
-            ladders[str(start)] = end
+    for _ in range(5):
+        start, end = _draw_pair(LADDER_CANDIDATES, used_tiles)
+        ladders[str(start)] = end
             
-    # Create Snakes
-    while len(snakes) < 4:
-        start = random.randint(15, 97)
-        end = random.randint(2, start - 10)
-        if (
-            str(start) not in ladders
-            and str(start) not in snakes
-            and start not in ladders.values()
-            and str(end) not in ladders
-            and end not in snakes.values()
-            and start not in snakes.values()
-            and str(end) not in snakes
-        ):
-            snakes[str(start)] = end
-    
-    # One snake guaranteed to be within 96-99
-    start = random.randint(98, 99)
-    end = random.randint(50, start - 10)
-    if (
-        str(start) not in ladders
-        and str(start) not in snakes
-        and start not in ladders.values()
-        and str(end) not in ladders
-        and end not in snakes.values()
-        and start not in snakes.values()
-        and str(end) not in snakes
-    ):
+    # Create Snakes, the last one guaranteed to be within 98-99
+    for candidates in [SNAKE_CANDIDATES] * 4 + [FINAL_SNAKE_CANDIDATES]:
+        start, end = _draw_pair(candidates, used_tiles)
         snakes[str(start)] = end
-    
             
     return {"snakes": snakes, "ladders": ladders}
 
-def save_game(state: GameState):
-    with sqlite3.connect(DB_FILE) as conn:
-        conn.execute(
-            "INSERT OR REPLACE INTO games (room_id, state) VALUES (?, ?)",
-            (state.room_id, state.json())
+def get_move_table(game: GameState) -> List[Tuple[int, str]]:
+    """
+    Returns the game's flat tile -> (final_pos, landed_msg) table, so moves need
+    no str() keys or dict lookups. The board never changes, so it's built once
+    per loaded game from the snakes/ladders dicts and kept off the JSON.
+    """
+    table = getattr(game, "_move_table", None)
+    if table is None:
+        table = [(tile, "") for tile in range(WINNING_TILE + 1)]
+        for start, end in game.board_config['snakes'].items():
+            table[int(start)] = (end, f"(Snake! {start}->{end})")
+        for start, end in game.board_config['ladders'].items():
+            table[int(start)] = (end, f"(Ladder! {start}->{end})")
+        game._move_table = table
+    return table
+
+def get_jump_table(game: GameState) -> np.ndarray:
+    """The move table's final positions as an array for sim, built once per loaded game."""
+    table = getattr(game, "_jump_table", None)
+    if table is None:
+        table = np.array([final_pos for final_pos, _ in get_move_table(game)], dtype=np.int64)
+        game._jump_table = table
+    return table
+
+def _cache_game(state: GameState):
+    """Inserts or refreshes a game in the LRU cache, evicting the oldest if full."""
+    _STATE_CACHE[state.room_id] = state
+    _STATE_CACHE.move_to_end(state.room_id)
+    if len(_STATE_CACHE) > MAX_CACHED_GAMES:
+        _STATE_CACHE.popitem(last=False)
+
+class StaleGameError(Exception):
+    """The game was saved by another worker since it was loaded, see save_game."""
+
+async def save_game(state: GameState) -> bytes:
+    """
+    Persists the game and returns its encoded JSON, reusable as the response body.
+    Raises StaleGameError (and drops the cached copy) if another worker saved
+    the room since this copy was loaded.
+    """
+    try:
+        del state.log[:-MAX_LOG_ENTRIES]
+        body = _ENCODER.encode(state)
+        rows = await _conn.execute_fetchall(
+            _SAVE_SQL, (state.status, body, state.room_id, state._version)
         )
-
-def load_game(room_id: str) -> Optional[GameState]:
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.execute("SELECT state FROM games WHERE room_id = ?", (room_id,))
-        row = cursor.fetchone()
-        if row:
-            return GameState(**json.loads(row[0]))
-    return None
+    except BaseException:
+        # The cached object already holds the unsaved changes, so the next
+        # load must re-read SQLite instead of serving them
+        _STATE_CACHE.pop(state.room_id, None)
+        raise
+    if not rows:
+        _STATE_CACHE.pop(state.room_id, None)
+        raise StaleGameError(state.room_id)
+    state._version = rows[0][0]
+    _cache_game(state)
+    return body
+
+async def insert_game(state: GameState) -> bool:
+    """Persists a new game, returns False if its room_id is already taken."""
+    rows = await _conn.execute_fetchall(
+        _INSERT_SQL, (state.room_id, state.status, _ENCODER.encode(state))
+    )
+    if not rows:
+        return False
+    state._version = rows[0][0]
+    _cache_game(state)
+    return True
+
+async def load_game(room_id: str) -> Optional[GameState]:
+    # Always asks SQLite for the version, since other workers may have saved
+    # the room, but only reads and decodes the state when it changed
+    state = _STATE_CACHE.get(room_id)
+    cached_version = state._version if state is not None else None
+    rows = await _conn.execute_fetchall(_LOAD_SQL, (cached_version, room_id))
+    if not rows:
+        _STATE_CACHE.pop(room_id, None)
+        return None
+    version, body = rows[0]
+    if body is None:
+        _STATE_CACHE.move_to_end(room_id)
+        return state
+    state = _DECODER.decode(body)
+    state._version = version
+    _cache_game(state)
+    return state
+
+async def cleanup_games() -> int:
+    """Deletes expired games from SQLite and the cache, returns how many were removed."""
+    rows = await _conn.execute_fetchall(_CLEANUP_SQL)
+    for (room_id,) in rows:
+        _STATE_CACHE.pop(room_id, None)
+    return len(rows)
+
+# Per-room locks around load -> mutate -> save, so concurrent requests for
+# the same room can't lose updates. They only work inside one process; across
+# workers, save_game's version check catches it. Weak values drop locks nobody holds.
+_ROOM_LOCKS: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def room_lock(room_id: str) -> asyncio.Lock:
+    lock = _ROOM_LOCKS.get(room_id)
+    if lock is None:
+        # No await in between, so this can't race on the event loop
+        lock = _ROOM_LOCKS[room_id] = asyncio.Lock()
+    return lock
+
+def json_response(body: bytes) -> Response:
+    """Wraps already encoded JSON, so FastAPI doesn't serialize the state again."""
+    return Response(content=body, media_type="application/json")
+
+# --- Housekeeping ---
+
+async def cleanup_loop():
+    while True:
+        await asyncio.sleep(CLEANUP_INTERVAL_SECONDS)
+        try:
+            removed = await cleanup_games()
+        except sqlite3.Error as e:
+            print(f"Cleanup Error: {e}")
+            continue
+        if removed:
+            print(f"Cleanup removed {removed} stale games")
 
 # --- Endpoints ---
 
+@app.exception_handler(StaleGameError)
+async def stale_game_handler(request: Request, exc: StaleGameError):
+    # A concurrent request for the same room won on another worker
+    return JSONResponse(status_code=409, content={"detail": "Room changed, please retry"})
+
 @app.get("/", response_class=HTMLResponse)
 def read_root(request: Request):
     """Serves the frontend HTML file."""
@@ -161,12 +460,11 @@ def read_root(request: Request):
     # return "<h1>Error: index.html not found in the same directory.</h1>"
 
 @app.post("/create", response_model=CreateGameResponse)
-def create_game():
-    room_id = generate_room_id()
-    player_token = str(uuid.uuid4())
+async def create_game():
+    player_token = secrets.token_urlsafe(16)
     
     initial_state = GameState(
-        room_id=room_id,
+        room_id=generate_room_id(),
         status="waiting",
         players=[player_token],
         turn_index=0,
@@ -175,28 +473,31 @@ def create_game():
         finished_pawns=[[False] * PAWNS_PER_PLAYER, [False] * PAWNS_PER_PLAYER]
     )
     
-    save_game(initial_state)
-    return {"room_id": room_id, "player_token": player_token}
+    # Ids are random, so on the rare clash with a live room just draw another
+    while not await insert_game(initial_state):
+        initial_state.room_id = generate_room_id()
+    return {"room_id": initial_state.room_id, "player_token": player_token}
 
 @app.post("/join", response_model=JoinGameResponse)
-def join_game(room_id: str = Body(..., embed=True)):
-    game = load_game(room_id)
-    if not game:
-        raise HTTPException(404, "Room not found")
+async def join_game(room_id: str = Body(..., embed=True)):
+    async with room_lock(room_id):
+        game = await load_game(room_id)
+        if not game:
+            raise HTTPException(404, "Room not found")
     
-    if len(game.players) >= 2:
-        raise HTTPException(400, "Room is full")
+        if len(game.players) >= 2:
+            raise HTTPException(400, "Room is full")
         
-    player_token = str(uuid.uuid4())
-    game.players.append(player_token)
-    game.status = "playing"
-    game.log.append("Player 2 joined. Game Start!")
+        player_token = secrets.token_urlsafe(16)
+        game.players.append(player_token)
+        game.status = "playing"
+        game.log.append("Player 2 joined. Game Start!")
     
-    save_game(game)
-    return {"player_token": player_token}
+        await save_game(game)
+        return {"player_token": player_token}
 
 @app.post("/play_computer", response_model=PlayComputerResponse)
-def play_computer(payload: PlayComputerPayload):
+async def play_computer(payload: PlayComputerPayload):
     # print(payload)
     room_id = payload.room_id
     computer_difficulty = payload.computer_difficulty
@@ -204,134 +505,101 @@ def play_computer(payload: PlayComputerPayload):
     if computer_difficulty not in ["easy", "normal", "hard", "extreme"]:
         raise HTTPException(500, "difficulty invalid, only accepts 'easy', 'normal', 'hard', 'extreme'")
     
-    game = load_game(room_id)
-    if not game:
-        raise HTTPException(404, "Room not found")
+    async with room_lock(room_id):
+        game = await load_game(room_id)
+        if not game:
+            raise HTTPException(404, "Room not found")
     
-    if len(game.players) >= 2:
-        raise HTTPException(400, "Room is full")
+        if len(game.players) >= 2:
+            raise HTTPException(400, "Room is full")
     
-    player_token = f"computer_{computer_difficulty}"
-    game.players.append(player_token)
-    game.status = "playing"
-    game.log.append(f"Computer {computer_difficulty} joined. Game Start!")
-    print(game.players)
-    save_game(game)
-    return {"player_token": player_token}
+        player_token = f"computer_{computer_difficulty}"
+        game.players.append(player_token)
+        game.status = "playing"
+        game.log.append(f"Computer {computer_difficulty} joined. Game Start!")
+        print(game.players)
+        await save_game(game)
+        return {"player_token": player_token}
 
 def computer_turn(
     game: GameState,
-    room_id: str,
     computer_token: str
 ):
+    computer_difficulty = computer_token.split(sep="_")[-1]
+    player_index = 1
+    # Bound once, the move logic updates these lists in place
+    current_positions = game.positions[player_index]
+    current_finished = game.finished_pawns[player_index]
+
     # Loop to handle rolling a 6 and getting another turn
     while game.status == "playing" and game.players[game.turn_index] == computer_token:
-        computer_difficulty = computer_token.split(sep="_")[-1]
-        player_index = 1
-        current_positions = game.positions[player_index]
         print(current_positions)
             
         if computer_difficulty == "easy":
-            dice_prob = {
-                1: 0.2857,
-                2: 0.2381,
-                3: 0.1905,
-                4: 0.1429,
-                5: 0.0952,
-                6: 0.0476,
-            }
-        elif computer_difficulty == "hard":
-            # Double prob to win when just one dice away
-            if min(current_positions) >= 94:
-                dice_to_win = 100 - min(current_positions)
-                dice_prob = {
-                    1: 0.1666,
-                    2: 0.1666,
-                    3: 0.1667,
-                    4: 0.1667,
-                    5: 0.1667,
-                    6: 0.1667,
-                }
-                dice_prob[dice_to_win] *= 2
-            else:
-                dice_prob = {
-                    1: 0.0476,
-                    2: 0.0952,
-                    3: 0.1429,
-                    4: 0.1905,
-                    5: 0.2381,
-                    6: 0.2857,
-                }
-        elif computer_difficulty == "extreme":
-            # triple prob to win when just one dice away
-            # Even unfair dice (quadratic)
+            dice_preset = "easy"
+        elif computer_difficulty == "hard" or computer_difficulty == "extreme":
+            # Boosted prob to win when just one dice away, see DICE_PRESETS
             if min(current_positions) >= 94:
-                dice_to_win = 100 - min(current_positions)
-                dice_prob = {
-                    1: 0.1666,
-                    2: 0.1666,
-                    3: 0.1667,
-                    4: 0.1667,
-                    5: 0.1667,
-                    6: 0.1667,
-                }
-                dice_prob[dice_to_win] *= 3
+                dice_to_win = WINNING_TILE - min(current_positions)
+                dice_preset = f"{computer_difficulty}_finish_{dice_to_win}"
             else:
-                dice_prob = {
-                    1: 0.0110,
-                    2: 0.0440,
-                    3: 0.0989,
-                    4: 0.1758,
-                    5: 0.2747,
-                    6: 0.3956,
-                }
+                dice_preset = computer_difficulty
         else:
-            dice_prob = None
+            dice_preset = None
         
         # --- ROLL Action ---
-        roll_req = ActionRequest(
-            room_id=room_id,
-            player_token=computer_token,
-            modifier={"dice_prob": dice_prob}
-        )
-        # Call the logic directly, avoiding HTTP
+        # Call the logic directly, avoiding HTTP and request models
         try:
-            game = process_roll_logic(game, roll_req)
+            game = process_roll_logic(game, computer_token, dice_preset=dice_preset)
         except ValueError as e:
             # If for some reason the roll is invalid, break the loop
             print(f"Computer Roll Error: {e}")
             break
         
-        save_game(game)
-        
-        # After saving the roll, reload the state to ensure the logic works on a fresh view 
-        # (Though not strictly necessary in this direct call flow, it's good practice
-        # if the logic was more complex or involved dependencies)
-        # game = load_game(room_id)
-        
         last_roll = game.last_roll
         
         if computer_difficulty == "easy":
-            pawn_index = [pi for pi in range(PAWNS_PER_PLAYER) if not game.finished_pawns[player_index][pi]]
+            pawn_index = [pi for pi in range(PAWNS_PER_PLAYER) if not current_finished[pi]]
             pawn_to_move = random.choice(pawn_index) if pawn_index else 0
-        elif computer_difficulty == "normal" or computer_difficulty == "hard" or computer_difficulty == "extreme":
+        elif computer_difficulty == "hard" or computer_difficulty == "extreme":
+            available_pawns = [pi for pi in range(PAWNS_PER_PLAYER) if not current_finished[pi]]
+            if len({current_positions[pi] for pi in available_pawns}) == 1:
+                # Every candidate makes the same move
+                pawn_to_move = available_pawns[0]
+            else:
+                # Play every candidate move out many times and take the one that wins most
+                win_rates = sim.pawn_win_rates(
+                    np.array(game.positions, dtype=np.int64),
+                    np.array(game.finished_pawns, dtype=np.bool_),
+                    get_jump_table(game),
+                    *ROLLOUT_DICE[computer_difficulty],
+                    player_index,
+                    last_roll,
+                    ROLLOUTS_PER_PAWN,
+                )
+                pawn_to_move = int(win_rates.argmax())
+        elif computer_difficulty == "normal":
             # Normal Difficulty = move but prevent pawn with snake,
             # prioritize pawn to the next ladder,
             # prevent one pawn to be finished first, wait all pawn on the 90-100 area
             
-            # Hard roll higher dice more likely
-            
             # 1. Identify non-finished pawns
             available_pawns = [
                 pi for pi in range(PAWNS_PER_PLAYER)
-                if not game.finished_pawns[player_index][pi]
+                if not current_finished[pi]
             ]
 
             if not available_pawns:
                 pawn_to_move = 0 # Should not happen if game is still active
             else:
-                best_move = -1
-                max_priority = -1
+                pawn_to_move = available_pawns[0]
+                max_priority = float("-inf")
+                
+                # Loop invariants: candidates are never finished pawns, so these
+                # don't depend on which pawn is being evaluated
+                move_table = get_move_table(game)
+                finished_count = PAWNS_PER_PLAYER - len(available_pawns)
+                all_near_end = all(current_positions[pi] >= 90 for pi in available_pawns)
                 
                 # --- Move Evaluation ---
                 for pawn_idx in available_pawns:
@@ -344,31 +612,24 @@ def computer_turn(
                         # Lowest priority: stay put
                         priority = 0
                     else:
-                        # Check the tile landed on after the move
-                        landed_pos = new_pos
-                        
                         # 1. Base Priority: Progress (Simply moving forward)
                         # priority = new_pos 
                         
-                        str_new_pos = str(new_pos)
+                        # Check the tile landed on after the move
+                        landed_pos = move_table[new_pos][0]
                         
                         # 2. Prevent Snake: Check if the *new_pos* is a snake head
-                        if str_new_pos in game.board_config['snakes']:
+                        if landed_pos < new_pos:
                             priority -= 100 # Heavy penalty for landing on a snake
-                            landed_pos = game.board_config['snakes'][str_new_pos]
                         
                         # 3. Prioritize Ladder: Check if the *new_pos* is a ladder bottom
-                        elif str_new_pos in game.board_config['ladders']:
+                        elif landed_pos > new_pos:
                             priority += 100 # Strong bonus for landing on a ladder
-                            landed_pos = game.board_config['ladders'][str_new_pos]
                         
                         # 4. End Game Management: Prioritize moving all pawns to 90-99 area,
                         #    and only finish one if all others are also near the end.
                         #    Note: This simplified version will mainly focus on the "don't finish first" part,
                         #          and prioritizing progress to 90+ area for all.
-                        
-                        finished_count = sum(game.finished_pawns[player_index])
-                        all_near_end = all(p >= 90 for i, p in enumerate(current_positions) if not game.finished_pawns[player_index][i] or i == pawn_idx)
 
                         if new_pos == WINNING_TILE:
                             # Prevent one pawn to be finished first
@@ -395,61 +656,81 @@ def computer_turn(
                         # to keep the pawns clustered for the end-game waiting strategy.
                         if current_positions[pawn_idx] < current_positions[pawn_to_move]:
                             pawn_to_move = pawn_idx
-                    else:
-                        pawn_to_move = available_pawns[0]
+
+                    # A safe finish can't be beaten, stop searching
+                    if max_priority >= 300:
+                        break
 
             pawn_index = pawn_to_move
         
         # --- MOVE Action ---
-        move_req = ActionRequest(
-            room_id=room_id,
-            player_token=computer_token,
-            pawn_index=pawn_to_move
-        )
-
-        # Call the logic directly, avoiding HTTP
+        # Call the logic directly, avoiding HTTP and request models
         try:
-            game = process_move_logic(game, move_req)
+            game = process_move_logic(game, computer_token, pawn_to_move)
         except ValueError as e:
             print(f"Computer Move Error: {e}")
             break
 
-        save_game(game)
-        # Reload the game state to check if turn has changed for the next loop iteration
-        game = load_game(room_id)
-        
-        # The loop condition will now check if it's still the computer's turn 
-        # (i.e., if last_roll was 6 or if the game ended)
+        # The in-memory game is authoritative; the loop condition will now check
+        # if it's still the computer's turn (i.e., if last_roll was 6 or if the game ended)
+
     return game # The function returns the final state after the computer's turn(s)
 
 @app.get("/state/{room_id}")
-def get_state(room_id: str):
-    game = load_game(room_id)
+async def get_state(room_id: str):
+    # Malformed ids can't exist, answer without the lock or SQLite
+    if len(room_id) != ROOM_ID_LENGTH:
+        raise HTTPException(404, "Room not found")
+
+    async with room_lock(room_id):
+        game = await load_game(room_id)
+        if not game:
+            raise HTTPException(404, "Room not found")
     
-    # When plays against computer, roll dice and move random pawn
-    if len(game.players) > 1:
-        if game.players[1].startswith("computer") and game.turn_index == 1:
-            computer_token = game.players[1]
-            computer_turn(
-                game=game,
-                room_id=room_id,
-                computer_token=computer_token,
-            )
+        # When plays against computer, roll dice and move random pawn
+        if len(game.players) > 1:
+            if game.players[1].startswith("computer") and game.turn_index == 1:
+                computer_token = game.players[1]
+                # CPU-bound, keep it off the event loop
+                try:
+                    game = await run_in_threadpool(
+                        computer_turn,
+                        game=game,
+                        computer_token=computer_token,
+                    )
+                except BaseException:
+                    # computer_turn mutates the cached game in place, don't serve a half-played turn
+                    _STATE_CACHE.pop(room_id, None)
+                    raise
+                # Persist once, after all of the computer's turn(s)
+                try:
+                    return json_response(await save_game(game))
+                except StaleGameError:
+                    # Another worker's poll played this turn first, show its outcome
+                    game = await load_game(room_id)
+                    if not game:
+                        raise HTTPException(404, "Room not found")
     
-    if not game:
-        raise HTTPException(404, "Room not found")
-    return game
+        return json_response(_ENCODER.encode(game))
 
 # --- Helpers for Core Game Logic ---
 
 # New helper for the roll logic (no API/request handling)
-def process_roll_logic(game: GameState, req: ActionRequest) -> GameState:
-    """Calculates the roll and updates game state without HTTP logic."""
+def process_roll_logic(
+    game: GameState,
+    player_token: str,
+    modifier: Optional[dict] = None,
+    dice_preset: Optional[str] = None,
+) -> GameState:
+    """
+    Calculates the roll and updates game state without HTTP logic.
+    dice_preset (a DICE_PRESETS key) is only set by computer_turn, never from a request.
+    """
     
     # Validation checks from the original /roll (simplified for internal use)
     if game.status != "playing":
         raise ValueError("Game not active")
-    if game.players[game.turn_index] != req.player_token:
+    if game.players[game.turn_index] != player_token:
         # This check is what's causing the 400 error in your current setup!
         raise ValueError("Not computer's turn") 
     if game.phase != "ROLL":
@@ -457,9 +738,12 @@ def process_roll_logic(game: GameState, req: ActionRequest) -> GameState:
 
     entity = "Computer" if game.players[game.turn_index].startswith("computer") else "Player"
     
-    if req.modifier.get("dice_prob", {}):
-        values = list(req.modifier.get("dice_prob").keys())
-        probs = list(req.modifier.get("dice_prob").values())
+    modifier = modifier or {}
+    if dice_preset is not None:
+        roll = roll_weighted(DICE_PRESETS[dice_preset])
+    elif modifier.get("dice_prob", {}):
+        values = list(modifier.get("dice_prob").keys())
+        probs = list(modifier.get("dice_prob").values())
         # Convert keys to int, as they were strings in the original dict
         roll = random.choices([int(v) for v in values], probs)[0] 
     else:
@@ -471,29 +755,33 @@ def process_roll_logic(game: GameState, req: ActionRequest) -> GameState:
     return game
 
 # New helper for the move logic (no API/request handling)
-def process_move_logic(game: GameState, req: ActionRequest) -> GameState:
+def process_move_logic(game: GameState, player_token: str, pawn_index: Optional[int]) -> GameState:
     """Calculates the move and updates game state without HTTP logic."""
     
     # Validation checks from the original /move (simplified for internal use)
-    if req.pawn_index is None:
+    if pawn_index is None:
         raise ValueError("Invalid request: pawn_index missing")
     if game.phase != "MOVE":
         raise ValueError("Must roll first")
-    if game.players[game.turn_index] != req.player_token:
+    if game.players[game.turn_index] != player_token:
         # This check is what's causing the 400 error in your current setup!
         raise ValueError("Not computer's turn") 
         
-    pawn_idx = req.pawn_index
+    pawn_idx = pawn_index
     current_player = game.turn_index
     entity = "Computer" if game.players[current_player].startswith("computer") else "Player"
+    # Shared by every log line below
+    entity_prefix = f"{entity} {current_player+1}"
     
     # ... (rest of the /move logic from line 419)
     if pawn_idx < 0 or pawn_idx >= PAWNS_PER_PLAYER:
         raise ValueError("Invalid pawn")
         
-    current_pos = game.positions[current_player][pawn_idx]
+    player_positions = game.positions[current_player]
+    player_finished = game.finished_pawns[current_player]
+    current_pos = player_positions[pawn_idx]
     
-    if game.finished_pawns[current_player][pawn_idx]:
+    if player_finished[pawn_idx]:
         raise ValueError("Pawn already finished")
         
     roll = game.last_roll
@@ -502,35 +790,26 @@ def process_move_logic(game: GameState, req: ActionRequest) -> GameState:
     if new_pos > WINNING_TILE:
         game.log.append(f"Pawn {pawn_idx+1} needs exact roll. Stayed at {current_pos}.")
     else:
-        landed_msg = ""
-        str_pos = str(new_pos)
-        
-        if str_pos in game.board_config['snakes']:
-            final_pos = game.board_config['snakes'][str_pos]
-            landed_msg = f"(Snake! {new_pos}->{final_pos})"
-            new_pos = final_pos
-        elif str_pos in game.board_config['ladders']:
-            final_pos = game.board_config['ladders'][str_pos]
-            landed_msg = f"(Ladder! {new_pos}->{final_pos})"
-            new_pos = final_pos
+        new_pos, landed_msg = get_move_table(game)[new_pos]
             
-        game.positions[current_player][pawn_idx] = new_pos
-        game.log.append(f"{entity} {current_player+1} moved Pawn {pawn_idx+1} to {new_pos} {landed_msg}")
+        player_positions[pawn_idx] = new_pos
+        game.log.append(f"{entity_prefix} moved Pawn {pawn_idx+1} to {new_pos} {landed_msg}")
 
         if new_pos == WINNING_TILE:
-            game.finished_pawns[current_player][pawn_idx] = True
-            game.log.append(f"{entity} {current_player+1}'s Pawn {pawn_idx+1} Finished!")
-
-    if all(game.finished_pawns[current_player]):
-        game.status = "finished"
-        game.winner = current_player
-        game.log.append(f"{entity.upper()} {current_player+1} WINS!")
+            player_finished[pawn_idx] = True
+            game.log.append(f"{entity_prefix}'s Pawn {pawn_idx+1} Finished!")
+
+            # The game can only be won by the move that finishes a pawn
+            if all(player_finished):
+                game.status = "finished"
+                game.winner = current_player
+                game.log.append(f"{entity_prefix.upper()} WINS!")
     
     if game.status != "finished":
         if game.last_roll != 6:
             game.turn_index = 1 - game.turn_index
         else:
-            game.log.append(f"{entity} {current_player+1} rolled 6, goes again!")
+            game.log.append(f"{entity_prefix} rolled 6, goes again!")
             
     game.phase = "ROLL"
     game.last_roll = None
@@ -538,31 +817,31 @@ def process_move_logic(game: GameState, req: ActionRequest) -> GameState:
     return game
 
 @app.post("/roll")
-def roll_dice(req: ActionRequest):
-    game = load_game(req.room_id)
-    if not game:
-        raise HTTPException(404, "Room not found")
+async def roll_dice(req: ActionRequest):
+    async with room_lock(req.room_id):
+        game = await load_game(req.room_id)
+        if not game:
+            raise HTTPException(404, "Room not found")
     
-    # Use the logic helper
-    try:
-        game = process_roll_logic(game, req)
-    except ValueError as e:
-        raise HTTPException(400, str(e))
+        # Use the logic helper
+        try:
+            game = process_roll_logic(game, req.player_token, req.modifier)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
         
-    save_game(game)
-    return game
+        return json_response(await save_game(game))
 
 @app.post("/move")
-def move_pawn(req: ActionRequest):
-    game = load_game(req.room_id)
-    if not game:
-        raise HTTPException(404, "Room not found")
+async def move_pawn(req: ActionRequest):
+    async with room_lock(req.room_id):
+        game = await load_game(req.room_id)
+        if not game:
+            raise HTTPException(404, "Room not found")
     
-    # Use the logic helper
-    try:
-        game = process_move_logic(game, req)
-    except ValueError as e:
-        raise HTTPException(400, str(e))
+        # Use the logic helper
+        try:
+            game = process_move_logic(game, req.player_token, req.pawn_index)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
         
-    save_game(game)
-    return game
\ No newline at end of file
+        return json_response(await save_game(game))
\ No newline at end of file